@@ -8,6 +8,7 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
 from app.config import Config
+from app.json_provider import OrjsonProvider
 
 # ── Extension instances (created once, initialised in create_app) ──────────
 db = SQLAlchemy()
@@ -17,14 +18,14 @@ migrate = Migrate()
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://",
-)
+)  # storage backend + strategy come from RATELIMIT_* in Config
 
 
 def create_app(config_class=Config):
     """Application factory — creates and configures the Flask app."""
 
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     app.config.from_object(config_class)
 
     # Ensure critical directories exist
@@ -42,11 +43,18 @@ def create_app(config_class=Config):
     login_manager.login_message_category = "info"
 
     # ── User loader callback ──────────────────────────────────────────
-    from app.models import User
+    from sqlalchemy import select
 
+    from app.models import User, CurrentUser
+
+    # Core column select → lightweight CurrentUser (no ORM instance per
+    # request). Flask-Login memoises the result on `g` for the request.
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        row = db.session.execute(
+            select(User.id, User.username, User.role).where(User.id == int(user_id))
+        ).first()
+        return CurrentUser(*row) if row else None
 
     # ── Register blueprints ─────────────────────────────────────────
     from app.routes import main
@@ -98,8 +106,14 @@ def create_app(config_class=Config):
         db.session.commit()
         click.echo(f"✓ User '{username}' is now an admin.")
 
-    # Create tables on first run (development convenience)
-    with app.app_context():
-        db.create_all()
+    # Create tables on first run (development convenience). Deployments that
+    # manage the schema with `flask db upgrade` can switch this off so each
+    # worker boot skips the reflection + CREATE TABLE round-trips.
+    if app.config.get("AUTO_CREATE_TABLES", False):
+        with app.app_context():
+            db.create_all()
+            # Under gunicorn --preload this runs in the master; don't let the
+            # forked workers inherit (and share) its pooled connection
+            db.engine.dispose()
 
     return app
@@ -10,10 +10,13 @@ from flask import (
     current_app,
 )
 from flask_login import current_user
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 from app import db
 from app.decorators import admin_required
 from app.models import User, Document
+from app.rag_utils import delete_chunks
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -25,20 +28,29 @@ admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 @admin_bp.route("/")
 @admin_required
 def dashboard():
-    users = User.query.order_by(User.id).all()
-    total_users = len(users)
-    total_docs = Document.query.count()
+    # One LEFT JOIN + GROUP BY instead of a COUNT query per user
+    rows = (
+        db.session.query(
+            User.id, User.username, User.role, func.count(Document.id)
+        )
+        .outerjoin(Document, Document.user_id == User.id)
+        .group_by(User.id)
+        .order_by(User.id)
+        .all()
+    )
 
     # Build user stats
-    user_stats = []
-    for user in users:
-        doc_count = Document.query.filter_by(user_id=user.id).count()
-        user_stats.append({
-            "id": user.id,
-            "username": user.username,
-            "role": user.role,
+    user_stats = [
+        {
+            "id": user_id,
+            "username": username,
+            "role": role,
             "doc_count": doc_count,
-        })
+        }
+        for user_id, username, role, doc_count in rows
+    ]
+    total_users = len(user_stats)
+    total_docs = sum(stat["doc_count"] for stat in user_stats)
 
     return render_template(
         "admin/dashboard.html",
@@ -81,7 +93,12 @@ def toggle_role(user_id):
 @admin_bp.route("/users/<int:user_id>/delete", methods=["POST"])
 @admin_required
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
+    # Fetch the user and their documents in a single round-trip
+    user = (
+        User.query.options(joinedload(User.documents))
+        .filter_by(id=user_id)
+        .first_or_404()
+    )
 
     # Prevent self-deletion
     if user.id == current_user.id:
@@ -89,22 +106,31 @@ def delete_user(user_id):
         return redirect(url_for("admin.dashboard"))
 
     username = user.username
+    doc_ids = [str(doc.id) for doc in user.documents]
 
-    # Delete user's uploaded files from disk
+    # Delete user's uploaded files from disk (one unlink per file, no stat)
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
     for doc in user.documents:
-        filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], doc.filename)
         try:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-        except OSError:
+            os.unlink(os.path.join(upload_folder, doc.filename))
+        except OSError:  # includes FileNotFoundError
             pass
 
     try:
         db.session.delete(user)  # cascade deletes documents
         db.session.commit()
-        flash(f'User "{username}" and all their data deleted.', "success")
     except Exception:
         db.session.rollback()
         flash("Failed to delete user.", "danger")
+        return redirect(url_for("admin.dashboard"))
+
+    # Clean up vectors (best-effort after SQL commit)
+    try:
+        for doc_id in doc_ids:
+            delete_chunks(doc_id)
+    except Exception:
+        pass
+
+    flash(f'User "{username}" and all their data deleted.', "success")
 
     return redirect(url_for("admin.dashboard"))
@@ -0,0 +1,64 @@
+"""
+Compressed LangChain docstore for the FAISS vector store.
+
+InMemoryDocstore keeps a full Document object (a pydantic model with its
+own metadata dict) per chunk — around a kilobyte or two of Python heap
+each before the text itself. This store keeps one zstd-compressed bytes
+object per chunk instead and rebuilds the Document on lookup; retrieval
+only ever touches k chunks, so the decompression is negligible.
+"""
+
+import orjson
+import zstandard
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+_ZSTD_LEVEL = 3
+
+
+def _pack(doc: Document) -> bytes:
+    return zstandard.compress(
+        orjson.dumps([doc.page_content, doc.metadata]), _ZSTD_LEVEL
+    )
+
+
+def _unpack(blob: bytes) -> Document:
+    page_content, metadata = orjson.loads(zstandard.decompress(blob))
+    return Document(page_content=page_content, metadata=metadata)
+
+
+class CompressedDocstore(Docstore, AddableMixin):
+    """Docstore holding each Document as compressed (content, metadata) JSON."""
+
+    def __init__(self, docs=None):
+        self._dict = {}
+        if docs:
+            self.add(docs)
+
+    @classmethod
+    def from_docstore(cls, docstore) -> "CompressedDocstore":
+        """Convert an InMemoryDocstore (e.g. from an older saved index)."""
+        return cls(docstore._dict)
+
+    def __len__(self):
+        return len(self._dict)
+
+    def add(self, texts):
+        overlapping = set(texts).intersection(self._dict)
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        # Update in place; InMemoryDocstore copies the whole dict per add
+        self._dict.update((ds_id, _pack(doc)) for ds_id, doc in texts.items())
+
+    def delete(self, ids):
+        overlapping = set(ids).intersection(self._dict)
+        if not overlapping:
+            raise ValueError(f"Tried to delete ids that does not  exist: {ids}")
+        for ds_id in ids:
+            self._dict.pop(ds_id)
+
+    def search(self, search):
+        blob = self._dict.get(search)
+        if blob is None:
+            return f"ID {search} not found."
+        return _unpack(blob)
@@ -9,23 +9,50 @@ class Config:
 
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-me")
 
+    # Password hashing — bcrypt cost factor (flask-bcrypt defaults to 12)
+    BCRYPT_LOG_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 10))
+
     # Database — defaults to SQLite, overridable via DATABASE_URL for PostgreSQL
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "DATABASE_URL", "sqlite:///app.db"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    AUTO_CREATE_TABLES = os.environ.get("AUTO_CREATE_TABLES", "1") == "1"
 
     # PostgreSQL connection pooling (ignored by SQLite)
     SQLALCHEMY_ENGINE_OPTIONS = {
         "pool_pre_ping": True,
     }
+    if SQLALCHEMY_DATABASE_URI.startswith("postgresql"):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            {
+                "pool_size": 20,
+                "max_overflow": 10,
+                "pool_recycle": 1800,  # seconds — drop connections before server/proxy idle cut-offs
+                "pool_timeout": 5,  # fail fast instead of queueing behind a starved pool
+                "connect_args": {"options": "-c statement_timeout=5000"},
+            }
+        )
+
+    # Rate limiting — use Redis in production so every worker shares one
+    # counter; the moving-window check runs as a single Lua script per hit
+    RATELIMIT_STORAGE_URI = os.environ.get("RATELIMIT_STORAGE_URI", "memory://")
+    RATELIMIT_STRATEGY = "moving-window"
+
+    # Background LLM jobs — when set, generation runs on an RQ worker instead
+    # of the request thread (can share the rate limiter's Redis)
+    LLM_QUEUE_URL = os.environ.get("LLM_QUEUE_URL", "")
+
+    # Load the embedding model + FAISS index at import time (for gunicorn
+    # --preload, so workers share them after fork)
+    PRELOAD_VECTORSTORE = os.environ.get("PRELOAD_VECTORSTORE", "0") == "1"
 
     # File uploads
     UPLOAD_FOLDER = os.path.join(
         os.path.dirname(os.path.abspath(__file__)), "uploads"
     )
     MAX_CONTENT_LENGTH = 20 * 1024 * 1024  # 20 MB
-    ALLOWED_EXTENSIONS = {"pdf", "txt", "md"}
+    ALLOWED_EXTENSIONS = frozenset({"pdf", "txt", "md"})
 
     # Gemini API
     GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
@@ -0,0 +1,68 @@
+"""
+Persistent embedding cache — sha256(model + chunk text) -> float32 vector.
+
+Re-uploaded notes and shared boilerplate produce identical chunks; looking
+their vectors up here skips the transformer forward pass entirely. Backed
+by a single SQLite file (stdlib, safe across worker processes).
+"""
+
+import hashlib
+import sqlite3
+import threading
+
+import numpy as np
+
+_conns = {}  # path -> sqlite3.Connection
+_lock = threading.Lock()
+
+# Stay under SQLite's default bound-parameter limit per query
+_BATCH = 500
+
+
+def content_key(model_name: str, text: str) -> bytes:
+    """Cache key for a chunk — includes the model so vectors never mix."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+
+def _connect(path: str):
+    conn = _conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding "
+            "(key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        _conns[path] = conn
+    return conn
+
+
+def get_many(path: str, keys) -> dict:
+    """Return {key: vector} for every key already in the cache."""
+    found = {}
+    with _lock:
+        conn = _connect(path)
+        for start in range(0, len(keys), _BATCH):
+            batch = keys[start : start + _BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embedding WHERE key IN ({placeholders})",
+                batch,
+            )
+            for key, blob in rows:
+                found[bytes(key)] = np.frombuffer(blob, dtype=np.float32)
+    return found
+
+
+def put_many(path: str, vectors: dict):
+    """Store {key: vector} pairs in one transaction."""
+    with _lock:
+        conn = _connect(path)
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding (key, vector) VALUES (?, ?)",
+                [
+                    (key, np.asarray(vec, dtype=np.float32).tobytes())
+                    for key, vec in vectors.items()
+                ],
+            )
@@ -0,0 +1,54 @@
+"""
+Optional background queue for LLM generation (RQ + Redis).
+
+When LLM_QUEUE_URL is set, routes enqueue generate_answer() on the "llm"
+queue and hand the browser a job id to poll, so a multi-second Ollama call
+no longer pins a web worker. Without it, generation runs inline.
+
+Run a worker with:  rq worker llm --url $LLM_QUEUE_URL
+"""
+
+from flask import current_app
+
+from app.rag_utils import generate_answer
+
+_queue = None
+
+
+def get_queue():
+    """Return the shared RQ queue, or None when no queue is configured."""
+    global _queue
+    url = current_app.config.get("LLM_QUEUE_URL")
+    if not url:
+        return None
+    if _queue is None:
+        from redis import Redis
+        from rq import Queue
+
+        _queue = Queue("llm", connection=Redis.from_url(url))
+    return _queue
+
+
+def enqueue_answer(prompt: str, user_id, result_key: str):
+    """Queue a generation job tagged with its owner and response field name."""
+    return get_queue().enqueue(
+        generate_answer,
+        prompt,
+        job_timeout=60,
+        meta={"user_id": user_id, "result_key": result_key},
+    )
+
+
+def fetch_job(job_id: str):
+    """Look up a queued job by id; None if unknown, expired, or no queue."""
+    queue = get_queue()
+    if queue is None:
+        return None
+
+    from rq.exceptions import NoSuchJobError
+    from rq.job import Job
+
+    try:
+        return Job.fetch(job_id, connection=queue.connection)
+    except NoSuchJobError:
+        return None
@@ -1,3 +1,4 @@
+from collections import namedtuple
 from datetime import datetime, timezone
 from flask_login import UserMixin
 from app import db
@@ -13,9 +14,13 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(200), nullable=False)
     role = db.Column(db.String(20), nullable=False, default="user")  # "user" or "admin"
 
-    # Virtual relationship — not a real column in the table
+    # Virtual relationship — not a real column in the table.
+    # "selectin" loads documents for every loaded user in one IN-query.
     documents = db.relationship(
-        "Document", backref="owner", lazy=True, cascade="all, delete-orphan"
+        "Document",
+        back_populates="owner",
+        lazy="selectin",
+        cascade="all, delete-orphan",
     )
 
     @property
@@ -26,10 +31,27 @@ class User(UserMixin, db.Model):
         return f"<User {self.username} ({self.role})>"
 
 
+class CurrentUser(UserMixin, namedtuple("CurrentUser", "id username role")):
+    """Read-only snapshot of a user row, used as Flask-Login's `current_user`.
+
+    Loaded with a plain column SELECT, so authenticated requests skip ORM
+    hydration. Routes that modify a user load the full `User` explicitly.
+    """
+
+    @property
+    def is_admin(self):
+        return self.role == "admin"
+
+
 class Document(db.Model):
     """Metadata record for an uploaded file."""
 
     __tablename__ = "document"
+    __table_args__ = (
+        # Per-user counts and "my documents" listings, newest first — the
+        # dashboard's ORDER BY upload_date DESC is a forward range scan
+        db.Index("ix_document_user_upload", "user_id", db.text("upload_date DESC")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(300), nullable=False)       # UUID-safe name on disk
@@ -40,6 +62,7 @@ class Document(db.Model):
     user_id = db.Column(
         db.Integer, db.ForeignKey("user.id"), nullable=False
     )
+    owner = db.relationship("User", back_populates="documents")
 
     def __repr__(self):
         return f"<Document {self.original_name}>"
@@ -0,0 +1,59 @@
+"""
+INT8-quantised all-MiniLM-L6-v2 on ONNX Runtime.
+
+Drop-in replacement for the PyTorch HuggingFaceEmbeddings: same tokenizer,
+mean pooling over the attention mask and L2 normalisation, but the
+transformer runs as a dynamically-quantised INT8 graph (VNNI int8 dot
+products), roughly halving embedding time on CPU with a ~4x smaller model.
+Requires the optional `optimum[onnxruntime]` package.
+"""
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from optimum.onnxruntime import ORTModelForFeatureExtraction
+from transformers import AutoTokenizer
+
+_ONNX_FILE = "model_qint8_avx512_vnni.onnx"
+_MAX_LENGTH = 256  # all-MiniLM-L6-v2's max_seq_length
+_BATCH_SIZE = 64
+
+
+class OnnxMiniLMEmbeddings(Embeddings):
+    """LangChain `Embeddings` backed by the quantised ONNX MiniLM graph."""
+
+    def __init__(self, model: str = "all-MiniLM-L6-v2"):
+        repo = f"sentence-transformers/{model}"
+        # Distinct name so cached fp32 and int8 vectors never mix
+        self.model_name = f"{model}/{_ONNX_FILE}"
+        self._tokenizer = AutoTokenizer.from_pretrained(repo)
+        self._model = ORTModelForFeatureExtraction.from_pretrained(
+            repo,
+            subfolder="onnx",
+            file_name=_ONNX_FILE,
+            provider="CPUExecutionProvider",
+        )
+
+    def embed_documents(self, texts):
+        vectors = []
+        for start in range(0, len(texts), _BATCH_SIZE):
+            batch = self._tokenizer(
+                texts[start : start + _BATCH_SIZE],
+                padding=True,
+                truncation=True,
+                max_length=_MAX_LENGTH,
+                return_tensors="np",
+            )
+            hidden = self._model(**batch).last_hidden_state
+
+            # Mean-pool real tokens only, then L2-normalise
+            mask = batch["attention_mask"].astype(np.float32)
+            pooled = np.einsum("bt,btd->bd", mask, hidden)
+            pooled /= np.clip(mask.sum(axis=1, keepdims=True), 1e-9, None)
+            pooled /= np.clip(
+                np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None
+            )
+            vectors.extend(pooled.astype(np.float32).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
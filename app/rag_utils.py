@@ -4,7 +4,13 @@ Uses FAISS for vector storage (reliable prebuilt wheels on all platforms).
 """
 
 import os
-import json
+import atexit
+import contextlib
+import functools
+import itertools
+import orjson
+import random
+import threading
 import time
 import logging
 
@@ -22,6 +28,7 @@ _VECTOR_DIR = os.path.join(
 # ╚══════════════════════════════════════════════════════════════════════╝
 
 _embeddings = None
+_EMBED_MODEL = "all-MiniLM-L6-v2"
 
 
 def _get_embeddings():
@@ -30,21 +37,134 @@ def _get_embeddings():
     if _embeddings is not None:
         return _embeddings
 
+    # Prefer the INT8-quantised ONNX graph when optimum is installed
+    try:
+        from app.onnx_embeddings import OnnxMiniLMEmbeddings
+
+        _embeddings = OnnxMiniLMEmbeddings(_EMBED_MODEL)
+        logger.info(f"Using INT8 ONNX {_EMBED_MODEL} embeddings")
+        return _embeddings
+    except ImportError:
+        pass
+
     from langchain_community.embeddings import HuggingFaceEmbeddings
 
-    _embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+    # Encode in large batches so each upload is a few batched forward passes
+    _embeddings = HuggingFaceEmbeddings(
+        model_name=_EMBED_MODEL,
+        encode_kwargs={"batch_size": 64, "normalize_embeddings": True},
+    )
     logger.info("Using local HuggingFace all-MiniLM-L6-v2 embeddings (free, no API quota)")
 
     return _embeddings
 
 
+def _embed_cache_path():
+    return os.path.join(_VECTOR_DIR, "embed_cache.sqlite3")
+
+
+def _embed_texts(texts):
+    """Embed chunk texts, reusing cached vectors for any seen before.
+
+    Only cache misses go through the model (in one batched call); the new
+    vectors are written back so re-uploads cost a hash + lookup per chunk.
+    """
+    import numpy as np
+
+    from app import embed_cache
+
+    embeddings = _get_embeddings()
+    cache_path = _embed_cache_path()
+    # Keyed by backend-specific model name so fp32/int8 vectors never mix
+    keys = [embed_cache.content_key(embeddings.model_name, text) for text in texts]
+    vectors = embed_cache.get_many(cache_path, keys)
+
+    misses = [i for i, key in enumerate(keys) if key not in vectors]
+    if misses:
+        # One list -> float32 matrix conversion for the whole batch
+        fresh = np.asarray(
+            embeddings.embed_documents([texts[i] for i in misses]),
+            dtype="float32",
+        )
+        new = {keys[i]: row for i, row in zip(misses, fresh)}
+        embed_cache.put_many(cache_path, new)
+        vectors.update(new)
+
+    logger.info(f"Embedded {len(misses)} chunks ({len(texts) - len(misses)} cached)")
+    return np.vstack([vectors[key] for key in keys])
+
+
 # ╔══════════════════════════════════════════════════════════════════════╗
-# ║  FAISS VECTOR STORE  (with user/doc metadata filtering)            ║
+# ║  FAISS VECTOR STORE  (with per-user id selection)                  ║
 # ╚══════════════════════════════════════════════════════════════════════╝
 
 _vectorstore = None
 _FAISS_INDEX = os.path.join(_VECTOR_DIR, "faiss_index")
 
+# doc_id -> FAISS ids of that document's chunks, and user_id -> doc_ids.
+# Both are persisted next to the index; retrieval turns them into an
+# IDSelector so user isolation happens inside the FAISS search.
+_doc_faiss_ids = {}
+_user_doc_ids = {}
+_DOC_IDS_FILE = os.path.join(_FAISS_INDEX, "doc_ids.json")
+_USER_DOCS_FILE = os.path.join(_FAISS_INDEX, "user_docs.json")
+
+# FAISS ids come from a persisted monotonic counter, so ids freed by a
+# delete are never handed to a later chunk
+_next_faiss_id = 0
+_NEXT_ID_FILE = os.path.join(_FAISS_INDEX, "next_id.txt")
+_INDEX_FILE = os.path.join(_FAISS_INDEX, "index.faiss")
+_DOCSTORE_FILE = os.path.join(_FAISS_INDEX, "index.pkl")
+
+# The saved index is memory-mapped read-only on load, so workers start
+# without reading it all into RAM and pages come in from the OS cache as
+# searches touch them. The first write swaps in an in-memory copy.
+_index_mmapped = False
+_mapped_file = None  # open handle on the inode that is mapped
+
+# Several workers share the saved files. Saves take an exclusive flock and
+# loads a shared one, so a load never pairs one save's index with another's
+# docstore. `_disk_stamp` is (st_ino, st_mtime_ns) of the index file as this
+# process last loaded or saved it; a mismatch means another worker saved.
+_LOCK_FILE = os.path.join(_FAISS_INDEX, "store.lock")
+_disk_stamp = None
+_disk_lock_depth = threading.local()  # lets a save reload under its own lock
+
+# doc_id -> True (stored) / False (deleted) for changes not yet saved. If
+# another worker saves first, its store is reloaded and these are replayed
+# on top, so neither worker's uploads are lost.
+_unsaved_docs = {}
+
+# Saves are debounced: rewriting the whole index after every upload is
+# O(N) bytes per write. Flush once mutations go quiet, or after a burst.
+_SAVE_DELAY_SECONDS = 5
+_SAVE_MAX_PENDING = 20
+_store_lock = threading.RLock()  # guards index mutations and saves
+_save_timer = None
+_pending_saves = 0
+
+# The store starts as an exact flat index and is rebuilt as IVF-PQ once it
+# holds enough vectors to train the coarse quantizer (~39 per inverted list).
+_IVF_NLIST = 256
+_IVF_PQ_M = 32  # sub-quantizers; must divide the embedding dim (384 for MiniLM)
+_IVF_FACTORY = f"IVF{_IVF_NLIST},PQ{_IVF_PQ_M}x8"
+_IVF_NPROBE = 8
+_IVF_MIN_TRAIN = 39 * _IVF_NLIST
+
+# The id filter only applies inside the probed lists, so a user with few
+# chunks can find none of them in 8 of 256. Selections up to this size skip
+# the index and are scored exactly against their vectors from the embedding
+# cache, at a cost that tracks the selection, not the store. Larger ones (or
+# any whose vectors aren't all cached) search the index and re-probe every
+# list if a query comes back short; that pass touches the whole store.
+_IVF_EXACT_MAX_IDS = 2048
+
+# IVF-PQ scores are approximate: fetch this many times k candidates and
+# re-rank them exactly against their full vectors from the embedding cache
+_RERANK_FACTOR = 4
+
+_ivf_rebuild = None  # background IVF-PQ training thread, if one has run
+
 
 def _ensure_dir():
     os.makedirs(_VECTOR_DIR, exist_ok=True)
@@ -52,71 +172,607 @@ def _ensure_dir():
 
 def _get_vectorstore():
     """Lazy-load the FAISS vector store."""
-    global _vectorstore
+    global _vectorstore, _index_mmapped
     if _vectorstore is not None:
         return _vectorstore
 
     from langchain_community.vectorstores import FAISS
-    from langchain_core.documents import Document as LCDoc
+    from langchain_community.vectorstores.utils import DistanceStrategy
 
     _ensure_dir()
     emb = _get_embeddings()
 
-    if os.path.exists(os.path.join(_FAISS_INDEX, "index.faiss")):
-        _vectorstore = FAISS.load_local(
-            _FAISS_INDEX, emb, allow_dangerous_deserialization=True
-        )
+    if os.path.exists(_INDEX_FILE):
+        _vectorstore = _load_saved_store(emb, mmap=True)
+        _drop_placeholder(_vectorstore)
         logger.info("Loaded existing FAISS index")
     else:
-        # Create a new empty store with a placeholder doc
-        _vectorstore = FAISS.from_documents(
-            [LCDoc(page_content="placeholder", metadata={"user_id": "0", "doc_id": "0"})],
+        import faiss
+
+        from app.compressed_docstore import CompressedDocstore
+
+        # Create a new, truly empty store. Vectors are unit-length, so inner
+        # product ranks like cosine with one matmul.
+        dim = len(emb.embed_query("probe"))
+        _vectorstore = FAISS(
             emb,
+            faiss.IndexIDMap2(faiss.IndexFlatIP(dim)),
+            CompressedDocstore(),
+            {},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
         )
-        _vectorstore.save_local(_FAISS_INDEX)
+        _index_mmapped = False
+        _doc_faiss_ids.clear()
+        _user_doc_ids.clear()
+        _load_next_id(_vectorstore)
+        _save_vectorstore()
         logger.info("Created new FAISS index")
 
     return _vectorstore
 
 
+def preload():
+    """Load the embedding model, FAISS index and Ollama client now instead
+    of on first use.
+
+    Called from the gunicorn master under `--preload`, so forked workers
+    share the model weights and the mmap'd index pages copy-on-write rather
+    than each loading their own. Nothing here opens a connection to Ollama,
+    so no sockets are inherited across the fork.
+    """
+    _get_embeddings()
+    _get_vectorstore()
+    _get_model()
+
+
+def _read_index_mmapped():
+    """Memory-map the saved index read-only.
+
+    IVF inverted lists are mapped by IO_FLAG_MMAP; flat codes need
+    IO_FLAG_MMAP_IFC (faiss >= 1.10), which faiss rejects for IVF files, so
+    the flag is picked from the file's fourcc ("Iw.." for IVF indexes).
+    """
+    import faiss
+
+    with open(_INDEX_FILE, "rb") as f:
+        is_ivf = f.read(2) == b"Iw"
+    flags = faiss.IO_FLAG_MMAP if is_ivf else getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    return faiss.read_index(_INDEX_FILE, flags | faiss.IO_FLAG_READ_ONLY)
+
+
+@contextlib.contextmanager
+def _disk_lock(exclusive: bool):
+    """Cross-process flock on the saved store (shared for loads).
+
+    Re-entrant within a thread: a save that finds a newer store on disk
+    reloads it while still holding its exclusive lock.
+    """
+    import fcntl
+
+    depth = getattr(_disk_lock_depth, "value", 0)
+    if depth:
+        _disk_lock_depth.value = depth + 1
+        try:
+            yield
+        finally:
+            _disk_lock_depth.value = depth
+        return
+
+    os.makedirs(_FAISS_INDEX, exist_ok=True)
+    with open(_LOCK_FILE, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        _disk_lock_depth.value = 1
+        try:
+            yield
+        finally:
+            _disk_lock_depth.value = 0
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _file_stamp(st):
+    return (st.st_ino, st.st_mtime_ns)
+
+
+def _disk_changed() -> bool:
+    """Has another worker saved the store since this process loaded/saved it?"""
+    try:
+        return _file_stamp(os.stat(_INDEX_FILE)) != _disk_stamp
+    except FileNotFoundError:
+        return False
+
+
+def _load_saved_store(emb, mmap: bool):
+    """Build the store and its sidecars from one consistent saved snapshot.
+
+    With `mmap`, the index is mapped read-only and a handle on that exact
+    inode is kept for `_make_writable`.
+    """
+    global _index_mmapped, _mapped_file, _disk_stamp
+    import pickle
+
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    with _disk_lock(exclusive=False):
+        index_file = open(_INDEX_FILE, "rb")
+        index = _read_index_mmapped() if mmap else faiss.read_index(_INDEX_FILE)
+        with open(_DOCSTORE_FILE, "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        vs = FAISS(emb, index, docstore, index_to_docstore_id)
+        _load_id_maps(vs)
+        _load_next_id(vs)
+    _disk_stamp = _file_stamp(os.fstat(index_file.fileno()))
+
+    _ensure_compressed_docstore(vs)
+    _ensure_id_map(vs)
+    # Legacy stores are rebuilt in memory by _ensure_id_map
+    if _mapped_file is not None:
+        _mapped_file.close()
+    _index_mmapped = mmap and vs.index is index
+    _mapped_file = index_file if _index_mmapped else None
+    if _mapped_file is None:
+        index_file.close()
+    _sync_distance_strategy(vs)
+    _set_nprobe(vs.index)
+    return vs
+
+
+def _read_mapped_copy():
+    """Read the mapped index file into memory through the kept handle.
+
+    pread, not read: the handle may be shared with forked workers, so its
+    file offset must not be used.
+    """
+    import faiss
+
+    fd = _mapped_file.fileno()
+    offset = 0
+
+    def read(n):
+        nonlocal offset
+        data = os.pread(fd, n, offset)
+        offset += len(data)
+        return data
+
+    return faiss.read_index(faiss.PyCallbackIOReader(read))
+
+
+def _reload_saved_store(vs):
+    """Reload another worker's save into `vs` and replay `_unsaved_docs`.
+
+    Call under `_store_lock`. The whole store (index, docstore, id maps and
+    id counter) comes from the save, so ids and chunks from two processes
+    never mix; this process's unsaved uploads are re-added under fresh ids
+    and its unsaved deletes re-applied.
+    """
+    import faiss
+
+    replay = {}
+    for doc_id, stored in _unsaved_docs.items():
+        docs = []
+        if stored:
+            docs = [
+                vs.docstore.search(vs.index_to_docstore_id[i])
+                for i in _doc_faiss_ids.get(doc_id, ())
+            ]
+        replay[doc_id] = docs
+
+    fresh = _load_saved_store(vs.embedding_function, mmap=False)
+    vs.index = fresh.index
+    vs.docstore = fresh.docstore
+    vs.index_to_docstore_id = fresh.index_to_docstore_id
+    vs.distance_strategy = fresh.distance_strategy
+
+    for doc_id, docs in replay.items():
+        _remove_doc(vs, doc_id)
+        if docs:
+            texts = [d.page_content for d in docs]
+            vectors = _embed_texts(texts)  # cached when the chunks were stored
+            faiss.normalize_L2(vectors)
+            _add_doc_chunks(
+                vs, docs[0].metadata["user_id"], doc_id,
+                texts, vectors, [d.metadata for d in docs],
+            )
+    _invalidate_retrieval_cache()
+    logger.info(f"Reloaded FAISS index saved by another worker "
+                f"({len(replay)} unsaved documents replayed)")
+
+
+def _make_writable(vs):
+    """Make `vs` safe to mutate; call under `_store_lock` before any write.
+
+    If another worker has saved since this process loaded or last saved,
+    its store is reloaded first (see `_reload_saved_store`). Otherwise a
+    memory-mapped, read-only index is swapped for an in-memory copy of the
+    file that was actually mapped (mapped IVF lists can't be serialised,
+    and the path may already hold a newer file).
+    """
+    global _index_mmapped, _mapped_file
+    if _disk_changed():
+        _reload_saved_store(vs)
+        return
+
+    if not _index_mmapped:
+        return
+
+    vs.index = _read_mapped_copy()
+    _set_nprobe(vs.index)
+    _index_mmapped = False
+    _mapped_file.close()
+    _mapped_file = None
+
+
+def _drop_placeholder(vs):
+    """Remove the "placeholder" chunk older versions seeded new stores with."""
+    import numpy as np
+
+    ds_id = vs.index_to_docstore_id.get(0)
+    if ds_id is None or vs.docstore.search(ds_id).metadata.get("doc_id") != "0":
+        return
+
+    with _store_lock:
+        _make_writable(vs)
+        vs.index.remove_ids(np.asarray([0], dtype="int64"))
+        vs.docstore.delete([vs.index_to_docstore_id.pop(0)])
+    _schedule_save()
+    logger.info("Removed legacy placeholder chunk from the FAISS index")
+
+
+def _ensure_compressed_docstore(vs):
+    """Swap LangChain's InMemoryDocstore for the compressed one (stores
+    saved before it existed are converted on load)."""
+    from app.compressed_docstore import CompressedDocstore
+
+    if not isinstance(vs.docstore, CompressedDocstore):
+        vs.docstore = CompressedDocstore.from_docstore(vs.docstore)
+
+
+def _ensure_id_map(vs):
+    """Give the index stable int64 ids and an inner-product metric.
+
+    Flat indexes are addressed by position, which shifts on every removal.
+    Rebuild them as IndexIDMap2 using the current positions as ids, so the
+    existing `index_to_docstore_id` mapping stays valid. Stores built with
+    the old L2 metric are normalised and moved to IndexFlatIP on the way.
+    IVF indexes already store explicit ids and are left alone.
+    """
+    import faiss
+    import numpy as np
+
+    index = vs.index
+    if isinstance(index, faiss.IndexFlat):
+        flat, ids = index, np.arange(index.ntotal, dtype="int64")
+    elif isinstance(index, faiss.IndexIDMap2) and index.metric_type != faiss.METRIC_INNER_PRODUCT:
+        flat, ids = index.index, faiss.vector_to_array(index.id_map)
+    else:
+        return
+
+    vectors = flat.reconstruct_n(0, flat.ntotal)
+    faiss.normalize_L2(vectors)
+    id_map = faiss.IndexIDMap2(faiss.IndexFlatIP(flat.d))
+    id_map.add_with_ids(vectors, ids)
+    vs.index = id_map
+
+
+def _load_id_maps(vs):
+    """Load the doc/user id sidecars, rebuilding them from chunk metadata
+    for stores saved before they existed."""
+    _doc_faiss_ids.clear()
+    _user_doc_ids.clear()
+
+    if os.path.exists(_DOC_IDS_FILE) and os.path.exists(_USER_DOCS_FILE):
+        with open(_DOC_IDS_FILE, "rb") as f:
+            _doc_faiss_ids.update(orjson.loads(f.read()))
+        with open(_USER_DOCS_FILE, "rb") as f:
+            _user_doc_ids.update(orjson.loads(f.read()))
+        return
+
+    for faiss_id, docstore_id in vs.index_to_docstore_id.items():
+        meta = vs.docstore.search(docstore_id).metadata
+        doc_id = meta.get("doc_id", "0")
+        if doc_id == "0":  # skip the legacy empty-store placeholder
+            continue
+        if doc_id not in _doc_faiss_ids:
+            _user_doc_ids.setdefault(meta["user_id"], []).append(doc_id)
+        _doc_faiss_ids.setdefault(doc_id, []).append(int(faiss_id))
+
+
+def _load_next_id(vs):
+    """Restore the id counter; never below the highest id in use (older
+    stores have no counter file)."""
+    global _next_faiss_id
+    _next_faiss_id = max(vs.index_to_docstore_id, default=-1) + 1
+    if os.path.exists(_NEXT_ID_FILE):
+        with open(_NEXT_ID_FILE, "rb") as f:
+            _next_faiss_id = max(_next_faiss_id, int(f.read()))
+
+
+def _sync_distance_strategy(vs):
+    """LangChain doesn't persist the distance strategy — derive it from the index."""
+    import faiss
+    from langchain_community.vectorstores.utils import DistanceStrategy
+
+    if vs.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        vs.distance_strategy = DistanceStrategy.MAX_INNER_PRODUCT
+
+
+def _set_nprobe(index):
+    """Set how many inverted lists an IVF index probes per query (no-op for flat)."""
+    import faiss
+
+    if faiss.try_extract_index_ivf(index) is not None:
+        faiss.ParameterSpace().set_index_parameter(index, "nprobe", _IVF_NPROBE)
+
+
+def _maybe_upgrade_to_ivfpq(vs):
+    """Start an IVF-PQ rebuild of a flat index once there are enough vectors.
+
+    PQ32 codes are 32 bytes per vector (vs 1536 for raw float32) and each
+    query only scans `nprobe` of the inverted lists instead of the whole
+    store. Training takes tens of seconds, so it runs on a background
+    thread (see `_rebuild_ivfpq`); the flat index keeps serving until the
+    new one is swapped in. Called under `_store_lock`.
+    """
+    global _ivf_rebuild
+    import faiss
+
+    index = vs.index
+    if not isinstance(index, faiss.IndexIDMap2) or index.ntotal < _IVF_MIN_TRAIN:
+        return
+    if _ivf_rebuild is not None and _ivf_rebuild.is_alive():
+        return
+
+    _ivf_rebuild = threading.Thread(
+        target=_rebuild_ivfpq, args=(vs,), name="ivfpq-rebuild", daemon=True
+    )
+    _ivf_rebuild.start()
+
+
+def _rebuild_ivfpq(vs):
+    """Train an IVF-PQ copy of the flat index without holding the lock.
+
+    The vectors are snapshotted under `_store_lock`, trained on outside it,
+    and any adds/deletes made meanwhile are replayed before the swap.
+    MiniLM vectors are unit-length, so the IVF index uses inner product
+    (cosine). Vectors keep their FAISS ids, so `index_to_docstore_id` stays
+    valid.
+    """
+    import faiss
+    import numpy as np
+    from langchain_community.vectorstores.utils import DistanceStrategy
+
+    try:
+        with _store_lock:
+            flat = vs.index
+            ids = faiss.vector_to_array(flat.id_map)
+            vectors = flat.index.reconstruct_n(0, flat.ntotal)
+
+        faiss.normalize_L2(vectors)
+        ivfpq = faiss.index_factory(flat.d, _IVF_FACTORY, faiss.METRIC_INNER_PRODUCT)
+        ivfpq.train(vectors)
+        ivfpq.add_with_ids(vectors, ids)
+        _set_nprobe(ivfpq)
+
+        with _store_lock:
+            if vs.index is not flat or _disk_changed():
+                # Another worker saved meanwhile; the next upload reloads
+                # its store and retries
+                logger.info("FAISS index replaced during IVF-PQ training; skipped")
+                return
+
+            current = faiss.vector_to_array(flat.id_map)
+            removed = ids[~np.isin(ids, current)]
+            if len(removed):
+                ivfpq.remove_ids(faiss.IDSelectorBatch(removed))
+            added = ~np.isin(current, ids)
+            if added.any():
+                extra = flat.index.reconstruct_n(0, flat.ntotal)[added]
+                faiss.normalize_L2(extra)
+                ivfpq.add_with_ids(extra, current[added])
+
+            vs.index = ivfpq
+            vs.distance_strategy = DistanceStrategy.MAX_INNER_PRODUCT
+            _invalidate_retrieval_cache()
+            _schedule_save()
+        logger.info(f"Rebuilt FAISS index as IVF-PQ over {ivfpq.ntotal} vectors")
+    except Exception:
+        logger.exception("IVF-PQ rebuild failed; keeping the flat index")
+
+
 def _save_vectorstore():
-    if _vectorstore is not None:
-        _ensure_dir()
-        _vectorstore.save_local(_FAISS_INDEX)
+    """Write the index, docstore and id sidecars.
+
+    Each file goes to a temp name and is renamed into place, so a process
+    that still has the old index mapped keeps reading the old inode instead
+    of a file being truncated underneath it. If another worker saved since
+    this one last loaded, its store is merged in first rather than
+    overwritten. Call under `_store_lock`.
+    """
+    global _disk_stamp
+    if _vectorstore is None:
+        return
+
+    import pickle
+
+    import faiss
+
+    with _disk_lock(exclusive=True):
+        if _disk_changed():
+            _reload_saved_store(_vectorstore)
+
+        payloads = {
+            _DOCSTORE_FILE: pickle.dumps(
+                (_vectorstore.docstore, _vectorstore.index_to_docstore_id)
+            ),
+            _DOC_IDS_FILE: orjson.dumps(_doc_faiss_ids),
+            _USER_DOCS_FILE: orjson.dumps(_user_doc_ids),
+            _NEXT_ID_FILE: str(_next_faiss_id).encode(),
+        }
+        faiss.write_index(_vectorstore.index, _INDEX_FILE + ".tmp")
+        os.replace(_INDEX_FILE + ".tmp", _INDEX_FILE)
+        for path, data in payloads.items():
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        _disk_stamp = _file_stamp(os.stat(_INDEX_FILE))
+        _unsaved_docs.clear()
+
+
+def _schedule_save():
+    """Persist the store a few seconds after the last mutation (debounced)."""
+    global _save_timer, _pending_saves
+    with _store_lock:
+        _pending_saves += 1
+        if _pending_saves >= _SAVE_MAX_PENDING:
+            _flush_vectorstore()
+            return
+
+        if _save_timer is not None:
+            _save_timer.cancel()
+        _save_timer = threading.Timer(_SAVE_DELAY_SECONDS, _flush_vectorstore)
+        _save_timer.daemon = True
+        _save_timer.start()
+
+
+def _flush_vectorstore():
+    """Write any pending changes to disk now. Also runs at interpreter exit."""
+    global _save_timer, _pending_saves
+    with _store_lock:
+        if _save_timer is not None:
+            _save_timer.cancel()
+            _save_timer = None
+        if _pending_saves:
+            _pending_saves = 0
+            _save_vectorstore()
+
+
+atexit.register(_flush_vectorstore)
+
+
+def _add_vectors(vs, texts, vectors, metadatas):
+    """Add pre-computed vectors to the store under fresh FAISS ids.
+
+    Bypasses `FAISS.add_embeddings`, which assumes ids are positions.
+    Returns the FAISS ids assigned to the new vectors.
+    """
+    global _next_faiss_id
+    import uuid
+
+    import numpy as np
+    from langchain_core.documents import Document as LCDoc
+
+    ids = list(range(_next_faiss_id, _next_faiss_id + len(texts)))
+    _next_faiss_id += len(texts)
+    vs.index.add_with_ids(
+        np.asarray(vectors, dtype="float32"), np.asarray(ids, dtype="int64")
+    )
+
+    docstore_ids = [str(uuid.uuid4()) for _ in texts]
+    vs.docstore.add(
+        {
+            ds_id: LCDoc(page_content=text, metadata=meta)
+            for ds_id, text, meta in zip(docstore_ids, texts, metadatas)
+        }
+    )
+    vs.index_to_docstore_id.update(zip(ids, docstore_ids))
+    return ids
 
 
 # ╔══════════════════════════════════════════════════════════════════════╗
 # ║  CHUNKING                                                          ║
 # ╚══════════════════════════════════════════════════════════════════════╝
 
+_CHUNK_SIZE = 800
+_CHUNK_OVERLAP = 100
 
-def load_and_chunk(filepath: str):
+# PDFs with at least this many pages are split in a process pool
+_SPLIT_POOL_MIN_PAGES = 32
+
+
+def _get_split_fn():
+    """The text splitter (LangChain's recursive character splitter)."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=_CHUNK_SIZE,
+        chunk_overlap=_CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+    return splitter.split_text
+
+
+def _split_pages(pages, pooled: bool):
+    """Yield a Document per chunk of each (text, metadata) page, in order."""
+    from langchain_core.documents import Document as LCDoc
+
+    split = _get_split_fn()
+
+    # Splitting is CPU-bound — fan large PDFs out over processes; small
+    # files aren't worth the pool start-up cost. Workers come from a fork
+    # server: this runs on the `_prefetch` thread while other threads hold
+    # locks (model, store), and a plain fork would copy those locked.
+    if pooled:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        pages = list(pages)
+        ctx = multiprocessing.get_context("forkserver")
+        with ProcessPoolExecutor(mp_context=ctx) as ex:
+            per_page = ex.map(split, [text for text, _ in pages], chunksize=8)
+            for (_, meta), page_chunks in zip(pages, per_page):
+                for chunk in page_chunks:
+                    yield LCDoc(page_content=chunk, metadata=dict(meta))
+    else:
+        for text, meta in pages:
+            for chunk in split(text):
+                yield LCDoc(page_content=chunk, metadata=dict(meta))
+
+
+# PDFium is not thread-safe; concurrent uploads take turns per call
+_pdfium_lock = threading.Lock()
+
+
+def _pdfium_page_text(pdf, index: int) -> str:
+    """Text of one PDF page, with PDFium's CRLF line breaks made plain."""
+    with _pdfium_lock:
+        page = pdf[index]
+        textpage = page.get_textpage()
+        text = textpage.get_text_bounded()
+        textpage.close()
+        page.close()
+    return text.replace("\r\n", "\n")
+
+
+def iter_chunks(filepath: str):
     """
-    Extract text from a file and split into overlapping chunks.
+    Extract text from a file and yield overlapping chunks as they're split.
     Supports: .pdf, .txt, .md
     """
     ext = os.path.splitext(filepath)[1].lower()
 
     if ext == ".pdf":
-        from langchain_community.document_loaders import PyPDFLoader
+        import pypdfium2  # PDFium's native text extraction, far faster than pypdf
 
-        loader = PyPDFLoader(filepath)
-        pages = loader.load()
+        with _pdfium_lock:
+            pdf = pypdfium2.PdfDocument(filepath)
+        try:
+            pages = (
+                (_pdfium_page_text(pdf, i), {"source": filepath, "page": i})
+                for i in range(len(pdf))
+            )
+            yield from _split_pages(pages, pooled=len(pdf) >= _SPLIT_POOL_MIN_PAGES)
+        finally:
+            with _pdfium_lock:
+                pdf.close()
     else:
-        from langchain_community.document_loaders import TextLoader
+        with open(filepath, encoding="utf-8") as f:
+            pages = [(f.read(), {"source": filepath})]
+        yield from _split_pages(pages, pooled=False)
 
-        loader = TextLoader(filepath, encoding="utf-8")
-        pages = loader.load()
 
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
-
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=100,
-        separators=["\n\n", "\n", ". ", " ", ""],
-    )
-    chunks = splitter.split_documents(pages)
-    return chunks
+def load_and_chunk(filepath: str):
+    """All of a file's chunks as a list (see `iter_chunks`)."""
+    return list(iter_chunks(filepath))
 
 
 # ╔══════════════════════════════════════════════════════════════════════╗
@@ -124,28 +780,138 @@ def load_and_chunk(filepath: str):
 # ╚══════════════════════════════════════════════════════════════════════╝
 
 
+# Chunks are embedded and added to FAISS this many at a time
+_STORE_BATCH_SIZE = 64
+
+
+def _prefetch(iterable, maxsize: int):
+    """Iterate `iterable` on a background thread, up to `maxsize` items ahead.
+
+    Lets PDF parsing/splitting run while the caller embeds the previous
+    batch. Producer errors are re-raised here; closing the generator early
+    stops the producer.
+    """
+    import queue
+
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    done = object()
+    errors = []
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while (item := buffer.get()) is not done:
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+
+
 def store_chunks(chunks, user_id, doc_id, filename="", upload_date=""):
-    """Tag each chunk with user_id, doc_id, and file metadata, then add to FAISS."""
-    for chunk in chunks:
-        chunk.metadata["user_id"] = str(user_id)
-        chunk.metadata["doc_id"] = str(doc_id)
-        chunk.metadata["filename"] = filename
-        chunk.metadata["upload_date"] = upload_date
+    """Tag each chunk with user_id, doc_id, and file metadata, then add to FAISS.
 
-    vs = _get_vectorstore()
-    vs.add_documents(chunks)
-    _save_vectorstore()
-    logger.info(f"Stored {len(chunks)} chunks for doc_id={doc_id}")
+    `chunks` can be any iterable, e.g. `iter_chunks(path)`. It's drained on a
+    background thread and embedded in batches, so only the current batch of
+    chunks and vectors is held in memory. Returns the number of chunks stored.
+    """
+    import faiss
+
+    vs = _get_vectorstore()  # also creates _VECTOR_DIR for the embedding cache
+    stream = _prefetch(chunks, _STORE_BATCH_SIZE)
+    stored = 0
+    try:
+        while batch := list(itertools.islice(stream, _STORE_BATCH_SIZE)):
+            for chunk in batch:
+                chunk.metadata["user_id"] = str(user_id)
+                chunk.metadata["doc_id"] = str(doc_id)
+                chunk.metadata["filename"] = filename
+                chunk.metadata["upload_date"] = upload_date
+
+            texts = [c.page_content for c in batch]
+            metadatas = [c.metadata for c in batch]
+
+            # Embed the batch in one call (cache misses only), then hand
+            # FAISS the vectors
+            vectors = _embed_texts(texts)
+            faiss.normalize_L2(vectors)  # once at insert, so search is a plain dot product
+            with _store_lock:
+                _make_writable(vs)
+                _add_doc_chunks(vs, user_id, doc_id, texts, vectors, metadatas)
+                _maybe_upgrade_to_ivfpq(vs)
+                _invalidate_retrieval_cache()
+            stored += len(batch)
+    except Exception:
+        # Don't leave a half-indexed document behind
+        if stored:
+            delete_chunks(doc_id)
+        raise
+    finally:
+        stream.close()
+
+    if stored:
+        _schedule_save()
+    logger.info(f"Stored {stored} chunks for doc_id={doc_id}")
+    return stored
 
 
 def delete_chunks(doc_id: str):
-    """Remove metadata entries for a document.
-    Note: FAISS doesn't support native deletion by metadata, so we rebuild
-    the index excluding the deleted doc's chunks on next store operation.
-    For a personal learning project this is acceptable."""
-    # Soft delete — the chunks remain in FAISS but are filtered out at
-    # retrieval time by the user_id/doc_id metadata check.
-    logger.info(f"Marked doc_id={doc_id} for exclusion from retrieval")
+    """Remove a document's vectors from FAISS and its chunks from the docstore."""
+    vs = _get_vectorstore()
+    with _store_lock:
+        _make_writable(vs)  # first: the doc may only be in another worker's save
+        if str(doc_id) not in _doc_faiss_ids:
+            logger.info(f"No chunks stored for doc_id={doc_id}")
+            return
+        removed = _remove_doc(vs, str(doc_id))
+        _unsaved_docs[str(doc_id)] = False
+        _invalidate_retrieval_cache()
+    _schedule_save()
+    logger.info(f"Deleted {removed} chunks for doc_id={doc_id}")
+
+
+def _add_doc_chunks(vs, user_id, doc_id, texts, vectors, metadatas):
+    """Add one batch of a document's chunks and record it in the id maps.
+    Call under `_store_lock`."""
+    ids = _add_vectors(vs, texts, vectors, metadatas)
+    if str(doc_id) not in _doc_faiss_ids:
+        _user_doc_ids.setdefault(str(user_id), []).append(str(doc_id))
+    _doc_faiss_ids.setdefault(str(doc_id), []).extend(ids)
+    _unsaved_docs[str(doc_id)] = True
+
+
+def _remove_doc(vs, doc_id: str) -> int:
+    """Drop a document's vectors, chunks and id-map entries; returns how many
+    chunks were removed. Call under `_store_lock`."""
+    import numpy as np
+
+    ids = _doc_faiss_ids.pop(doc_id, [])
+    for user_docs in _user_doc_ids.values():
+        if doc_id in user_docs:
+            user_docs.remove(doc_id)
+            break
+    if ids:
+        vs.index.remove_ids(np.asarray(ids, dtype="int64"))
+        vs.docstore.delete([vs.index_to_docstore_id.pop(i) for i in ids])
+    return len(ids)
 
 
 # ╔══════════════════════════════════════════════════════════════════════╗
@@ -153,24 +919,203 @@ def delete_chunks(doc_id: str):
 # ╚══════════════════════════════════════════════════════════════════════╝
 
 
-def retrieve_relevant_chunks(question: str, user_id, k: int = 4):
-    """Similarity search filtered to this user's documents only."""
-    vs = _get_vectorstore()
+# Bumped on every store/delete; part of the retrieval cache key so a search
+# that raced a mutation can never be served afterwards
+_store_version = 0
+
+
+def _invalidate_retrieval_cache():
+    """Call under `_store_lock` after the index or id maps change."""
+    global _store_version
+    _store_version += 1
+    _search_docstore_ids.cache_clear()
+
 
-    # Pass the user_id as a metadata filter to FAISS.
-    # Set fetch_k to the total size of the index to ensure we don't drop
-    # matches that fall outside the default fetch range due to multi-user noise.
-    total_docs = vs.index.ntotal
-    fetch_k = max(20, total_docs)
-    
-    results = vs.similarity_search(
-        query=question, 
-        k=k, 
-        fetch_k=fetch_k, 
-        filter={"user_id": str(user_id)}
+def _normalize_question(question: str) -> str:
+    """Lowercase and collapse whitespace (the cache key).
+
+    The key is also the text that gets embedded, so punctuation is kept
+    ("C++" and "C#" must not both become "c"). MiniLM's tokenizer is
+    uncased, so lowercasing doesn't change the vector.
+    """
+    return " ".join(question.lower().split())
+
+
+def retrieve_relevant_chunks(question: str, user_id, k: int = 4, doc_ids=None):
+    """Similarity search restricted to this user's documents only.
+
+    The user's FAISS ids go to the index as an IDSelector, so isolation is
+    enforced inside the search and its cost doesn't grow with other users'
+    data. If `doc_ids` is given, only those documents (the ones still in
+    the DB) are searched.
+
+    Hits are cached per (question, user, k, documents), so the canned
+    quiz/puzzle/questions queries skip the encode and search on repeats.
+    """
+    return retrieve_relevant_chunks_batch([question], user_id, k, doc_ids)
+
+
+def retrieve_relevant_chunks_batch(questions, user_id, k: int = 4, doc_ids=None):
+    """Like `retrieve_relevant_chunks`, for several phrasings of one need.
+
+    All questions are embedded in one call and searched with a single
+    `index.search` over the stacked query matrix. Hits are merged rank by
+    rank across the questions, so each one contributes, then de-duplicated
+    and capped at `k`.
+    """
+    if doc_ids is not None:
+        doc_ids = frozenset(str(d) for d in doc_ids)
+
+    vs = _get_vectorstore()
+    hits = _search_docstore_ids(
+        tuple(_normalize_question(q) for q in questions),
+        str(user_id),
+        k,
+        doc_ids,
+        _store_version,
     )
+    with _store_lock:
+        return [vs.docstore.search(ds_id) for ds_id in hits]
 
-    return results
+
+@functools.lru_cache(maxsize=1024)
+def _search_docstore_ids(questions, user_id, k, doc_ids, version):
+    """Merged docstore ids of the top-k chunks; `version` only keys the cache."""
+    import faiss
+    import numpy as np
+
+    vs = _get_vectorstore()
+    xq = np.asarray(_get_embeddings().embed_documents(list(questions)), dtype="float32")
+    faiss.normalize_L2(xq)
+
+    with _store_lock:
+        user_docs = _user_doc_ids.get(user_id, [])
+        if doc_ids is not None:
+            user_docs = [d for d in user_docs if d in doc_ids]
+
+        ids = [i for d in user_docs for i in _doc_faiss_ids.get(d, ())]
+        if not ids:
+            return ()
+
+        ivf_index = faiss.try_extract_index_ivf(vs.index)
+        ivf = ivf_index is not None
+        ranked = None
+        if ivf and len(ids) <= _IVF_EXACT_MAX_IDS:
+            ranked = _rank_selection_exact(user_docs, xq, k)
+        if ranked is None:
+            ranked = _search_selection(vs, ivf_index, ids, xq, k)
+
+        # Merge rank by rank: every question's best hit, then every second...
+        merged = dict.fromkeys(
+            vs.index_to_docstore_id[i]
+            for rank in itertools.zip_longest(*ranked)
+            for i in rank
+            if i is not None
+        )
+        return tuple(merged)[:k]
+
+
+def _search_selection(vs, ivf_index, ids, xq, k):
+    """Top-k FAISS ids per query among `ids`, searched through the index.
+
+    IVF-PQ hits are over-fetched and re-ranked exactly; if the probed lists
+    held fewer than k of the selection, every list is probed again.
+    """
+    import faiss
+    import numpy as np
+
+    selector = faiss.IDSelectorBatch(np.asarray(ids, dtype="int64"))
+    ivf = ivf_index is not None
+    fetch = min(k * _RERANK_FACTOR if ivf else k, len(ids))
+    if ivf:
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=_IVF_NPROBE)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+
+    _, hits = vs.index.search(xq, fetch, params=params)
+    short = (hits[:, min(k, fetch) - 1] == -1).any()
+    if ivf and short and params.nprobe < ivf_index.nlist:
+        params.nprobe = ivf_index.nlist
+        _, hits = vs.index.search(xq, fetch, params=params)
+    ranked = [[i for i in row if i != -1] for row in hits]
+    if ivf:
+        ranked = [_rerank_exact(vs, q, row)[:k] for q, row in zip(xq, ranked)]
+    return ranked
+
+
+def _rank_selection_exact(doc_ids, xq, k):
+    """Top-k FAISS ids per query among the chunks of `doc_ids`, by exact
+    cosine similarity over their cached vectors; None if any isn't cached."""
+    import numpy as np
+
+    from app.rerank import cosine_scores
+
+    selected, matrices = [], []
+    for doc_id in doc_ids:
+        faiss_ids = tuple(_doc_faiss_ids.get(doc_id, ()))
+        if not faiss_ids:
+            continue
+        vectors = _doc_vectors(doc_id, faiss_ids)
+        if vectors is None:
+            return None
+        selected.extend(faiss_ids)
+        matrices.append(vectors)
+
+    selected = np.asarray(selected)
+    X = np.vstack(matrices)
+    return [
+        selected[np.argsort(-cosine_scores(q, X), kind="stable")[:k]].tolist()
+        for q in xq
+    ]
+
+
+# A document's FAISS ids are never reused for other content within a doc_id,
+# so (doc_id, ids) keys its vectors for good; uploads elsewhere don't evict it
+@functools.lru_cache(maxsize=128)
+def _doc_vectors(doc_id, faiss_ids):
+    """One document's full-precision vectors from the embedding cache."""
+    return _cached_vectors(_get_vectorstore(), faiss_ids)
+
+
+def _cached_vectors(vs, faiss_ids):
+    """Embedding-cache vectors for `faiss_ids` as a matrix (keyed by chunk
+    text, so no second copy is kept in the index); None if any is missing."""
+    import numpy as np
+
+    from app import embed_cache
+
+    model_name = _get_embeddings().model_name
+    keys = [
+        embed_cache.content_key(
+            model_name, vs.docstore.search(vs.index_to_docstore_id[i]).page_content
+        )
+        for i in faiss_ids
+    ]
+    vectors = embed_cache.get_many(_embed_cache_path(), keys)
+    if len(vectors) < len(set(keys)):
+        return None
+    return np.vstack([vectors[key] for key in keys])
+
+
+def _rerank_exact(vs, q, faiss_ids):
+    """Order IVF-PQ candidates by exact cosine similarity to `q`.
+
+    If any candidate's vector is missing from the embedding cache, the
+    approximate order is kept.
+    """
+    if not faiss_ids:
+        return faiss_ids
+
+    import numpy as np
+
+    from app.rerank import cosine_scores
+
+    vectors = _cached_vectors(vs, faiss_ids)
+    if vectors is None:
+        return faiss_ids
+
+    scores = cosine_scores(q, vectors)
+    return [faiss_ids[j] for j in np.argsort(-scores, kind="stable")]
 
 
 # ╔══════════════════════════════════════════════════════════════════════╗
@@ -178,21 +1123,7 @@ def retrieve_relevant_chunks(question: str, user_id, k: int = 4):
 # ╚══════════════════════════════════════════════════════════════════════╝
 
 
-def build_prompt(question: str, chunks) -> str:
-    """Build a grounded RAG prompt that constrains the LLM to the context."""
-    
-    # Include metadata (filename, date) alongside the actual chunk content
-    context_blocks = []
-    for c in chunks:
-        fname = c.metadata.get("filename", "Unknown File")
-        date = c.metadata.get("upload_date", "Unknown Date")
-        # Format block: [Filename (Uploaded: Date)] \n Content
-        block = f"[{fname} (Uploaded: {date})]\n{c.page_content}"
-        context_blocks.append(block)
-        
-    context_text = "\n\n---\n\n".join(context_blocks)
-
-    prompt = f"""You are an expert tutor helping a student study from their own notes and documents.
+_RAG_PROMPT_HEADER = """You are an expert tutor helping a student study from their own notes and documents.
 
 RULES:
 - Answer ONLY using the Context below.
@@ -203,12 +1134,21 @@ RULES:
 - Use clear, well-structured formatting with bullet points when appropriate.
 
 Context:
-{context_text}
+"""
 
-Question: {question}
 
-Answer:"""
-    return prompt
+def build_prompt(question: str, chunks) -> str:
+    """Build a grounded RAG prompt that constrains the LLM to the context."""
+
+    # Include metadata (filename, date) alongside the actual chunk content,
+    # one block per chunk: [Filename (Uploaded: Date)] \n Content
+    context_text = "\n\n---\n\n".join(
+        f"[{c.metadata.get('filename', 'Unknown File')} "
+        f"(Uploaded: {c.metadata.get('upload_date', 'Unknown Date')})]\n{c.page_content}"
+        for c in chunks
+    )
+
+    return f"{_RAG_PROMPT_HEADER}{context_text}\n\nQuestion: {question}\n\nAnswer:"
 
 
 # ╔══════════════════════════════════════════════════════════════════════╗
@@ -216,6 +1156,40 @@ Answer:"""
 # ╚══════════════════════════════════════════════════════════════════════╝
 
 _model = None
+_http_session = None
+_warmed_at = float("-inf")
+_WARMUP_INTERVAL_SECONDS = 240
+
+_OLLAMA_NOT_RUNNING = (
+    "⚠️ **Ollama is not running.**<br><br>"
+    "Please open your terminal and run:<br>"
+    "<code>ollama run llama3.2</code><br><br>"
+    "Leave that terminal running in the background, then try your question again."
+)
+_MODEL_NOT_FOUND = (
+    "⚠️ **Model not found.**<br><br>"
+    "You need to download the model first. "
+    "Open your terminal and run:<br>"
+    "<code>ollama run llama3.2</code>"
+)
+
+
+def _get_http_session():
+    """One keep-alive HTTP session for every call to the local Ollama server."""
+    global _http_session
+    if _http_session is not None:
+        return _http_session
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.mount(
+        "http://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+    )
+    _http_session = session
+    return _http_session
+
 
 def _get_model():
     """Lazy-load the local Ollama generative model."""
@@ -223,8 +1197,20 @@ def _get_model():
     if _model is not None:
         return _model
 
+    import types
+
+    import requests
+
     # Use langchain_community's Ollama integration
     from langchain_community.llms import Ollama
+    from langchain_community.llms import ollama as ollama_llm
+
+    # The wrapper POSTs through the module-level `requests.post`, opening a
+    # new connection per generation — point it at the shared session
+    shim = types.ModuleType("requests")
+    shim.__dict__.update(vars(requests))
+    shim.post = _get_http_session().post
+    ollama_llm.requests = shim
 
     logger.info("Initializing connection to local Ollama (model: llama3.2)...")
     # You can change 'llama3.2' to 'mistral' or 'phi3' depending on what you downloaded
@@ -232,43 +1218,95 @@ def _get_model():
     return _model
 
 
+def warm_up_model():
+    """Ask Ollama to load the model into memory ahead of the first question.
+
+    A generate request with no prompt only loads the model. Skipped if a
+    warmup went out recently (Ollama keeps a model loaded for 5 minutes).
+    Best effort — failures are logged and the first real request pays the
+    load instead.
+    """
+    global _warmed_at
+    import requests
+
+    if time.monotonic() - _warmed_at < _WARMUP_INTERVAL_SECONDS:
+        return
+    _warmed_at = time.monotonic()
+
+    model = _get_model()
+    try:
+        _get_http_session().post(
+            f"{model.base_url}/api/generate", json={"model": model.model}, timeout=60
+        )
+    except requests.RequestException as e:
+        logger.info(f"Ollama warmup skipped: {e}")
+
+
+def _backoff(attempt: int) -> float:
+    """Retry delay: 0.25 s, 0.5 s, 1 s, ... plus a little jitter."""
+    return 0.25 * 2**attempt + random.uniform(0, 0.1)
+
+
 def generate_answer(prompt: str, retries: int = 3) -> str:
     """Send the prompt to the local Ollama instance and return the response."""
+    from langchain_community.llms.ollama import OllamaEndpointNotFoundError
+    from requests.exceptions import ConnectionError as OllamaUnreachable
+
     model = _get_model()
 
     for attempt in range(retries):
         try:
-            # For langchain_community.llms.Ollama, we just call invoke()
-            response = model.invoke(prompt)
             # Ollama returns a raw string, not a complex response object like Gemini
-            return response
+            return model.invoke(prompt)
+        except OllamaUnreachable:
+            return _OLLAMA_NOT_RUNNING
+        except OllamaEndpointNotFoundError:
+            return _MODEL_NOT_FOUND
         except Exception as e:
-            error_str = str(e).lower()
-            if "connection refused" in error_str or "connect" in error_str:
-                return (
-                    "⚠️ **Ollama is not running.**<br><br>"
-                    "Please open your terminal and run:<br>"
-                    "<code>ollama run llama3.2</code><br><br>"
-                    "Leave that terminal running in the background, then try your question again."
-                )
-            if "not found" in error_str:
-                return (
-                    "⚠️ **Model not found.**<br><br>"
-                    "You need to download the model first. "
-                    "Open your terminal and run:<br>"
-                    "<code>ollama run llama3.2</code>"
-                )
-            
             logger.error(f"Ollama generation failed: {e}")
             if attempt < retries - 1:
-                time.sleep(2)
+                time.sleep(_backoff(attempt))
                 continue
-                
+
             return f"❌ Local generation failed: {str(e)}"
 
     return "Unable to generate an answer from the local model at this time."
 
 
+def generate_answer_stream(prompt: str, retries: int = 3):
+    """Yield the answer token by token as Ollama produces it.
+
+    Same error handling as `generate_answer`; a transient failure is only
+    retried before the first token, since a retry can't un-send text.
+    """
+    from langchain_community.llms.ollama import OllamaEndpointNotFoundError
+    from requests.exceptions import ConnectionError as OllamaUnreachable
+
+    model = _get_model()
+
+    for attempt in range(retries):
+        started = False
+        try:
+            for token in model.stream(prompt):
+                started = True
+                yield token
+            return
+        except OllamaUnreachable:
+            yield _OLLAMA_NOT_RUNNING
+            return
+        except OllamaEndpointNotFoundError:
+            yield _MODEL_NOT_FOUND
+            return
+        except Exception as e:
+            logger.error(f"Ollama streaming failed: {e}")
+            if not started and attempt < retries - 1:
+                time.sleep(_backoff(attempt))
+                continue
+
+            yield f"\n\n❌ Local generation failed: {str(e)}"
+            return
+
+
 # ╔══════════════════════════════════════════════════════════════════════╗
 # ║  CREATIVE PROMPT BUILDERS                                          ║
 # ╚══════════════════════════════════════════════════════════════════════╝
@@ -276,10 +1314,7 @@ def generate_answer(prompt: str, retries: int = 3) -> str:
 
 def _extract_context(chunks) -> str:
     """Extract context text from chunks for use in creative prompts."""
-    context_blocks = []
-    for c in chunks:
-        context_blocks.append(c.page_content)
-    return "\n\n".join(context_blocks)
+    return "\n\n".join(c.page_content for c in chunks)
 
 
 def build_quiz_prompt(chunks, num_questions: int = 5, topic: str = "") -> str:
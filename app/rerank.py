@@ -0,0 +1,44 @@
+"""
+Exact cosine scoring for re-ranking approximate (IVF-PQ) search candidates.
+
+With numba installed the kernel is JIT-compiled — normalisation and the
+dot product fused in one pass, the inner loop vectorised by LLVM. Without
+it, the same scores come from NumPy.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # optional dependency
+    njit = None
+
+
+def _cosine_scores_numpy(q, X):
+    norms = np.linalg.norm(X, axis=1) * np.linalg.norm(q)
+    return (X @ q) / np.maximum(norms, 1e-12)
+
+
+if njit is not None:
+
+    # Candidate sets are a few dozen rows, too small for prange to pay off
+    @njit(fastmath=True, cache=True)
+    def _cosine_scores_numba(q, X):
+        n, d = X.shape
+        q_sq = 0.0
+        for j in range(d):
+            q_sq += q[j] * q[j]
+
+        scores = np.empty(n, dtype=np.float32)
+        for i in range(n):
+            dot = 0.0
+            x_sq = 0.0
+            for j in range(d):
+                dot += q[j] * X[i, j]
+                x_sq += X[i, j] * X[i, j]
+            scores[i] = dot / max(np.sqrt(q_sq * x_sq), 1e-12)
+        return scores
+
+    cosine_scores = _cosine_scores_numba
+else:
+    cosine_scores = _cosine_scores_numpy
@@ -1,5 +1,7 @@
+import json
 import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 from flask import (
@@ -12,15 +14,36 @@ from flask import (
     jsonify,
     current_app,
     abort,
+    Response,
+    stream_with_context,
 )
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
 
 from app import db, bcrypt, limiter
+from app.llm_queue import enqueue_answer, fetch_job, get_queue
 from app.models import User, Document
+from app.rag_utils import (
+    build_prompt,
+    build_puzzle_prompt,
+    build_questions_prompt,
+    build_quiz_prompt,
+    delete_chunks,
+    generate_answer,
+    generate_answer_stream,
+    iter_chunks,
+    retrieve_relevant_chunks,
+    retrieve_relevant_chunks_batch,
+    store_chunks,
+    warm_up_model,
+)
 
 main = Blueprint("main", __name__)
 
+# Upload side work: Ollama warmup runs here while the request thread
+# chunks and embeds the file
+_upload_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upload")
+
 
 # ╔══════════════════════════════════════════════════════════════════════╗
 # ║  HELPERS                                                           ║
@@ -28,10 +51,51 @@ main = Blueprint("main", __name__)
 
 def _allowed_file(filename: str) -> bool:
     """Check if the file extension is in the whitelist."""
-    return (
-        "." in filename
-        and filename.rsplit(".", 1)[1].lower()
-        in current_app.config["ALLOWED_EXTENSIONS"]
+    _, dot, ext = filename.rpartition(".")
+    return bool(dot) and ext.lower() in current_app.config["ALLOWED_EXTENSIONS"]
+
+
+def _expand_query(query: str):
+    """The query plus definition/example phrasings, searched together for
+    broader context in the creative generators."""
+    return [query, f"{query} definitions", f"{query} examples"]
+
+
+def _user_doc_ids():
+    """IDs of the current user's live documents, used to filter retrieval."""
+    return [
+        doc_id
+        for (doc_id,) in db.session.query(Document.id).filter_by(
+            user_id=current_user.id
+        )
+    ]
+
+
+def _llm_response(prompt: str, result_key: str = "result"):
+    """Generate inline, or enqueue on the LLM queue and return a job id to poll."""
+    if get_queue() is None:
+        return jsonify({result_key: generate_answer(prompt)})
+
+    job = enqueue_answer(prompt, current_user.id, result_key)
+    return jsonify({"job_id": job.id}), 202
+
+
+def _stream_answer(prompt: str):
+    """Stream the answer as server-sent events, one JSON-encoded token each.
+
+    When generation runs on the LLM queue, fall back to the job response.
+    """
+    if get_queue() is not None:
+        return _llm_response(prompt, result_key="answer")
+
+    def events():
+        for token in generate_answer_stream(prompt):
+            yield f"data: {json.dumps(token)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -170,6 +234,10 @@ def upload():
     # Step 1 — save file to disk (outside DB transaction)
     file.save(filepath)
 
+    # Have Ollama load the model so it is ready by the time the user
+    # reaches /chat
+    _upload_pool.submit(warm_up_model)
+
     # Steps 2 + 3 — DB record + vector storage wrapped in transaction
     try:
         new_doc = Document(
@@ -183,18 +251,15 @@ def upload():
 
         # Chunk & embed into ChromaDB
         try:
-            from app.rag_utils import load_and_chunk, store_chunks
-
-            chunks = load_and_chunk(filepath)
-            if chunks:
-                date_str = new_doc.upload_date.strftime("%Y-%m-%d %H:%M:%S UTC")
-                store_chunks(
-                    chunks, 
-                    current_user.id, 
-                    new_doc.id,
-                    filename=original_name,
-                    upload_date=date_str
-                )
+            # Chunks stream into embedding as the file is parsed
+            date_str = new_doc.upload_date.strftime("%Y-%m-%d %H:%M:%S UTC")
+            store_chunks(
+                iter_chunks(filepath),
+                current_user.id,
+                new_doc.id,
+                filename=original_name,
+                upload_date=date_str
+            )
         except Exception as rag_err:
             current_app.logger.warning(f"RAG processing skipped: {rag_err}")
 
@@ -247,8 +312,6 @@ def delete_document(doc_id):
 
     # Step 3 — clean up vectors (best-effort)
     try:
-        from app.rag_utils import delete_chunks
-
         delete_chunks(saved_doc_id)
     except Exception:
         pass
@@ -280,14 +343,10 @@ def chat():
         return jsonify({"error": "Empty question."}), 400
 
     try:
-        from app.rag_utils import (
-            retrieve_relevant_chunks,
-            build_prompt,
-            generate_answer,
+        chunks = retrieve_relevant_chunks(
+            question, current_user.id, doc_ids=_user_doc_ids()
         )
 
-        chunks = retrieve_relevant_chunks(question, current_user.id)
-
         if not chunks:
             return jsonify(
                 {
@@ -297,8 +356,7 @@ def chat():
             )
 
         prompt = build_prompt(question, chunks)
-        answer = generate_answer(prompt)
-        return jsonify({"answer": answer})
+        return _stream_answer(prompt)
 
     except Exception as e:
         error_str = str(e).lower()
@@ -343,21 +401,16 @@ def quiz_generate():
     topic = data.get("topic", "").strip()
 
     try:
-        from app.rag_utils import (
-            retrieve_relevant_chunks,
-            build_quiz_prompt,
-            generate_answer,
-        )
-
         query = topic if topic else "key concepts and important topics"
-        chunks = retrieve_relevant_chunks(query, current_user.id, k=6)
+        chunks = retrieve_relevant_chunks_batch(
+            _expand_query(query), current_user.id, k=6, doc_ids=_user_doc_ids()
+        )
 
         if not chunks:
             return jsonify({"error": "No documents found. Upload some files first!"})
 
         prompt = build_quiz_prompt(chunks, num_questions, topic)
-        result = generate_answer(prompt)
-        return jsonify({"result": result})
+        return _llm_response(prompt)
 
     except Exception as e:
         current_app.logger.error(f"Quiz generation error: {e}")
@@ -386,20 +439,18 @@ def puzzle_generate():
     count = min(int(data.get("count", 8)), 12)
 
     try:
-        from app.rag_utils import (
-            retrieve_relevant_chunks,
-            build_puzzle_prompt,
-            generate_answer,
+        chunks = retrieve_relevant_chunks_batch(
+            _expand_query("important concepts and key terms"),
+            current_user.id,
+            k=6,
+            doc_ids=_user_doc_ids(),
         )
 
-        chunks = retrieve_relevant_chunks("important concepts and key terms", current_user.id, k=6)
-
         if not chunks:
             return jsonify({"error": "No documents found. Upload some files first!"})
 
         prompt = build_puzzle_prompt(chunks, puzzle_type, count)
-        result = generate_answer(prompt)
-        return jsonify({"result": result})
+        return _llm_response(prompt)
 
     except Exception as e:
         current_app.logger.error(f"Puzzle generation error: {e}")
@@ -428,21 +479,42 @@ def questions_generate():
     count = min(int(data.get("count", 6)), 10)
 
     try:
-        from app.rag_utils import (
-            retrieve_relevant_chunks,
-            build_questions_prompt,
-            generate_answer,
+        chunks = retrieve_relevant_chunks_batch(
+            _expand_query("key concepts and study material"),
+            current_user.id,
+            k=6,
+            doc_ids=_user_doc_ids(),
         )
 
-        chunks = retrieve_relevant_chunks("key concepts and study material", current_user.id, k=6)
-
         if not chunks:
             return jsonify({"error": "No documents found. Upload some files first!"})
 
         prompt = build_questions_prompt(chunks, q_type, count)
-        result = generate_answer(prompt)
-        return jsonify({"result": result})
+        return _llm_response(prompt)
 
     except Exception as e:
         current_app.logger.error(f"Questions generation error: {e}")
         return jsonify({"error": "Failed to generate questions. Please try again."}), 500
+
+
+# ╔══════════════════════════════════════════════════════════════════════╗
+# ║  BACKGROUND JOBS  (LLM queue polling)                              ║
+# ╚══════════════════════════════════════════════════════════════════════╝
+
+@main.route("/jobs/<job_id>")
+@login_required
+@limiter.exempt  # polled every second while a job runs
+def job_status(job_id):
+    job = fetch_job(job_id)
+
+    # ── Ownership check — jobs are only visible to whoever queued them ─
+    if job is None or job.meta.get("user_id") != current_user.id:
+        return jsonify({"error": "Job not found."}), 404
+
+    status = job.get_status()
+    if status == "finished":
+        return jsonify({job.meta["result_key"]: job.return_value()})
+    if status in ("failed", "stopped", "canceled"):
+        return jsonify({"error": "Generation failed. Please try again."}), 500
+
+    return jsonify({"status": status}), 202
@@ -48,22 +48,32 @@ async function sendMessage() {
     // Show typing indicator
     const typingEl = showTypingIndicator();
 
+    // Streamed tokens go into one bubble, created on the first token
+    let answer = '';
+    let content = null;
+
     try {
-        const res = await fetch('/chat', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ question }),
+        const { ok, data } = await postForStream('/chat', { question }, (token) => {
+            if (!content) {
+                typingEl.remove();
+                content = appendBubble('ai', '');
+            }
+            answer += token;
+            content.innerHTML = formatText(answer);
+            scrollToBottom();
         });
 
-        const data = await res.json();
-
-        // Remove typing indicator
-        typingEl.remove();
-
-        if (res.ok && data.answer) {
-            appendBubble('ai', data.answer);
-        } else {
-            appendBubble('ai', data.error || 'Something went wrong. Please try again.');
+        if (!content) {
+            // Not streamed — a plain JSON answer, queued job result, or error;
+            // data is null if a stream ended without sending any tokens
+            typingEl.remove();
+            if (ok && data && data.answer) {
+                appendBubble('ai', data.answer);
+            } else if (ok && !data) {
+                appendBubble('ai', 'No answer was generated. Please try again.');
+            } else {
+                appendBubble('ai', (data && data.error) || 'Something went wrong. Please try again.');
+            }
         }
     } catch (err) {
         typingEl.remove();
@@ -93,6 +103,7 @@ function appendBubble(role, text) {
     messagesEl.appendChild(bubble);
 
     scrollToBottom();
+    return content;
 }
 
 // ── Typing indicator ─────────────────────────────────────────────────
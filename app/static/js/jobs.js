@@ -0,0 +1,66 @@
+/**
+ * RAG Tutor — LLM request helpers
+ * POSTs a generation request and, if the server queued it as a background
+ * job, polls /jobs/<id> until the result is ready. Chat answers may instead
+ * arrive as a server-sent event stream of tokens.
+ */
+
+const JOB_POLL_INTERVAL_MS = 1000;
+// Jobs time out after 60 s on the worker (llm_queue.enqueue_answer); allow
+// as long again for queueing before giving up, e.g. if no worker is running
+const JOB_MAX_WAIT_MS = 120000;
+
+function postJSON(url, payload) {
+    return fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload),
+    });
+}
+
+async function resolveJob(res) {
+    const data = await res.json();
+
+    if (!data.job_id) return { ok: res.ok, data };
+
+    // Queued — poll until the job finishes or fails, or the wait runs out
+    const deadline = Date.now() + JOB_MAX_WAIT_MS;
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        const poll = await fetch(`/jobs/${data.job_id}`);
+        const pollData = await poll.json();
+        if (poll.status !== 202) return { ok: poll.ok, data: pollData };
+    }
+    return {
+        ok: false,
+        data: { error: 'The request is taking too long. Please try again later.' },
+    };
+}
+
+async function postForResult(url, payload) {
+    return resolveJob(await postJSON(url, payload));
+}
+
+// Calls onToken(text) for each streamed token. Non-streamed responses
+// (errors, queued jobs) resolve like postForResult; streamed ones resolve
+// with { ok, data: null } once the stream ends.
+async function postForStream(url, payload, onToken) {
+    const res = await postJSON(url, payload);
+    const type = res.headers.get('Content-Type') || '';
+    if (!type.startsWith('text/event-stream')) return resolveJob(res);
+
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += value;
+        const events = buffer.split('\n\n');
+        buffer = events.pop();  // keep any partial event for the next read
+        for (const event of events) {
+            if (event.startsWith('data: ')) onToken(JSON.parse(event.slice(6)));
+        }
+    }
+    return { ok: res.ok, data: null };
+}
@@ -85,13 +85,7 @@ async function generatePuzzle() {
     scrambledWords = {};
 
     try {
-        const res = await fetch('/puzzle/generate', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ type: puzzleType, count }),
-        });
-
-        const data = await res.json();
+        const { data } = await postForResult('/puzzle/generate', { type: puzzleType, count });
         if (data.error) { showPuzzleError(data.error); return; }
 
         const parsed = parseJSON(data.result);
@@ -58,13 +58,7 @@ async function generateQuestions() {
     answeredIds = {};
 
     try {
-        const res = await fetch('/questions/generate', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ type: questionType, count }),
-        });
-
-        const data = await res.json();
+        const { data } = await postForResult('/questions/generate', { type: questionType, count });
         if (data.error) { showQError(data.error); return; }
 
         const parsed = parseJSON(data.result);
@@ -53,13 +53,7 @@ async function generateQuiz() {
     btn.innerHTML = '<i class="ph ph-spinner"></i> Generating...';
 
     try {
-        const res = await fetch('/quiz/generate', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ topic, num_questions: numQuestions }),
-        });
-
-        const data = await res.json();
+        const { data } = await postForResult('/quiz/generate', { topic, num_questions: numQuestions });
 
         if (data.error) {
             showQuizError(data.error);
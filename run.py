@@ -2,5 +2,10 @@ from app import create_app
 
 app = create_app()
 
+if app.config["PRELOAD_VECTORSTORE"]:
+    from app.rag_utils import preload
+
+    preload()
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)